@@ -1,28 +1,63 @@
 from datetime import date, datetime, timedelta
+from email.utils import formatdate, parsedate_to_datetime
 import hmac
+import logging
 import os
-from functools import lru_cache
-
-import pytz
-from fastapi import FastAPI, HTTPException, Query
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+from operator import attrgetter
+from types import MappingProxyType
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.responses import Response
 from dotenv import load_dotenv
 import webuntis
-from icalendar import Calendar, Event
 
 # Load environment variables from .env if present
 load_dotenv()
 
 app = FastAPI(title="WebUntis → iCal bridge")
+logger = logging.getLogger(__name__)
 ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
+ACCESS_TOKEN_BYTES = ACCESS_TOKEN.encode() if ACCESS_TOKEN else None
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
+STALE_WHILE_REVALIDATE = 600
 
+# Zone names whose times are written in UTC form (...Z) instead of with a TZID
+UTC_ZONES = frozenset({
+    "UTC", "Etc/UTC", "UCT", "Etc/UCT", "Universal", "Etc/Universal", "Zulu", "Etc/Zulu",
+    "GMT", "Etc/GMT", "GMT0", "Etc/GMT0", "GMT+0", "Etc/GMT+0", "GMT-0", "Etc/GMT-0", "Greenwich", "Etc/Greenwich",
+})
 
-def get_tz():
-    tzname = os.getenv("TIMEZONE", "UTC")
-    try:
-        return pytz.timezone(tzname)
-    except Exception as exc:
-        raise RuntimeError(f"Invalid TIMEZONE '{tzname}': {exc}")
+# Resolve the timezone once so a bad TIMEZONE fails at startup rather than on every request
+TZ_NAME = os.getenv("TIMEZONE", "UTC")
+try:
+    TZ = ZoneInfo(TZ_NAME)
+except (ZoneInfoNotFoundError, ValueError, OSError) as exc:
+    raise RuntimeError(f"Invalid TIMEZONE '{TZ_NAME}': {exc}") from exc
+
+ICS_CACHE_SIZE = 32
+SESSION_MAX_AGE = 30 * 60
+LOOKUP_TTL = 6 * 60 * 60
+
+# Last built feed per (start, end, klasse): (etag, body, timestamp, last_modified)
+_ics_cache: dict[tuple, tuple[str, bytes, float, float]] = {}
+# One lock per cache key so a cold cache doesn't stampede WebUntis
+_ics_locks: dict[tuple, threading.Lock] = {}
+_ics_locks_guard = threading.Lock()
+
+# Subject/teacher/room/klassen tables: kind -> (value, timestamp)
+_lookups: dict[str, tuple[dict, float]] = {}
+
+_warned_malformed = False
+
+# Logged-in WebUntis session shared across requests
+_SESSION: webuntis.Session | None = None
+_SESSION_AT = 0.0
+_SESSION_LOCK = threading.Lock()
 
 
 def make_session():
@@ -43,6 +78,127 @@ def make_session():
     return s
 
 
+def _get_session():
+    """
+    Return the shared logged-in session, logging in again once it is SESSION_MAX_AGE old.
+    """
+    global _SESSION, _SESSION_AT
+    session = _SESSION
+    if session is not None and time.monotonic() - _SESSION_AT < SESSION_MAX_AGE:
+        return session
+    with _SESSION_LOCK:
+        if _SESSION is None or time.monotonic() - _SESSION_AT >= SESSION_MAX_AGE:
+            # The old session is not logged out; another request may still be using it
+            _SESSION = make_session()
+            _SESSION_AT = time.monotonic()
+            _lookups.pop("klassen", None)
+        return _SESSION
+
+
+def _drop_session(session):
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is session:
+            _SESSION = None
+
+
+def names_from_ids(entries, mapping, include_id=False):
+    """
+    Join display names for period entries, preferring the resolved mapping over the inline names.
+    """
+    get = mapping.get
+    labels = [
+        get(item.get("id")) or item.get("longname") or item.get("name") or str(item.get("id"))
+        for item in entries
+    ]
+    if include_id:
+        labels = [
+            f"{label} ({item['id']})" if item.get("id") is not None else label
+            for label, item in zip(labels, entries)
+        ]
+    return ", ".join(label for label in labels if label)
+
+
+def escape_text(text):
+    """
+    Escape an iCalendar TEXT value (RFC 5545 3.3.11).
+    """
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+        .replace("\r", "\\n")
+    )
+
+
+def ics_line(buf, name, value):
+    """
+    Append one iCalendar content line to buf, folding it at 75 octets. TEXT values must already be escaped.
+    """
+    line = f"{name}:{value}".encode()
+    if len(line) < 75:
+        buf += line + b"\r\n"
+        return
+    # Fold on character boundaries, never splitting an escape sequence
+    chunk = []
+    size = 0
+    for char in line.decode():
+        width = len(char.encode())
+        if chunk and size + width >= 75:
+            carry = chunk.pop() if len(chunk) > 1 and chunk[-1] == "\\" else None
+            buf += "".join(chunk).encode() + b"\r\n "
+            chunk = [carry] if carry else []
+            size = 1 if carry else 0
+        chunk.append(char)
+        size += width
+    buf += "".join(chunk).encode() + b"\r\n"
+
+
+def build_ics_header(tz_name):
+    """
+    Serialize the VCALENDAR properties preceding the first VEVENT.
+    """
+    buf = bytearray()
+    ics_line(buf, "BEGIN", "VCALENDAR")
+    ics_line(buf, "VERSION", "2.0")
+    ics_line(buf, "PRODID", "-//Untis ICS Bridge//")
+    ics_line(buf, "X-WR-CALNAME", "School Timetable")
+    ics_line(buf, "X-WR-TIMEZONE", escape_text(tz_name))
+    return bytes(buf)
+
+
+ICS_HEADER = build_ics_header(TZ_NAME)
+ICS_FOOTER = b"END:VCALENDAR\r\n"
+
+
+def period_labels(su_entries, te_entries, ro_entries, subject_map, teacher_map, room_map):
+    """
+    Return (subject, teachers, rooms, teacher_cancelled) for a period's entries.
+    Entries are expected to be dicts; anything else raises AttributeError.
+    """
+    subject_name = names_from_ids(su_entries, subject_map) or "Lesson"
+    teacher_names = names_from_ids(te_entries, teacher_map, include_id=True)
+    room_names = names_from_ids(ro_entries, room_map)
+    teacher_cancelled = 0 in {item.get("id") for item in te_entries}
+    return subject_name, teacher_names, room_names, teacher_cancelled
+
+
+def dict_entries(entries):
+    return [item for item in entries if isinstance(item, dict)]
+
+
+def warn_malformed(period):
+    """
+    Log the first period whose su/te/ro entries aren't all dicts; those fall back to filtering.
+    """
+    global _warned_malformed
+    if not _warned_malformed:
+        _warned_malformed = True
+        logger.warning("Period %s has malformed su/te/ro entries; skipping non-dict items", getattr(period, "id", "?"))
+
+
 def period_is_cancelled(period):
     # Common WebUntis flags for cancellations
     code = getattr(period, "code", "")
@@ -54,8 +210,8 @@ def format_people(items):
     return ", ".join(getattr(i, "longname", i.name) for i in items)
 
 
-# Provided fallback mapping when API rights are missing
-HARDCODED_TEACHERS = {
+# Provided fallback mapping when API rights are missing (read-only; requests merge it into their own dict)
+HARDCODED_TEACHERS = MappingProxyType({
     0: "cancelled",
     32: "gri",
     106: "sma",
@@ -69,178 +225,311 @@ HARDCODED_TEACHERS = {
     412: "flo",
     46: "jel",
     110: "std",
-}
+})
 
 
 def localize_dt(dt, tz):
     """
     WebUntis sometimes returns naive datetimes. Ensure they carry timezone.
     """
-    if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
-        return tz.localize(dt)
-    return dt.astimezone(tz)
+    return dt.replace(tzinfo=tz) if dt.tzinfo is None else dt.astimezone(tz)
 
 
-@lru_cache(maxsize=1)
-def cached_timezone():
-    return get_tz()
+def cached_lookup(kind, fetch):
+    """
+    Return a rarely changing lookup table (subjects, teachers, ...), refetching it after LOOKUP_TTL.
+    Failed fetches are not cached.
+    """
+    entry = _lookups.get(kind)
+    if entry and time.monotonic() - entry[1] < LOOKUP_TTL:
+        return entry[0]
+    value = fetch()
+    _lookups[kind] = (value, time.monotonic())
+    return value
 
 
-@app.get("/calendar.ics")
-def calendar(
-    weeks: int = Query(3, ge=1, description="How many weeks to include starting this week"),
-    past_weeks: int = Query(0, ge=0, description="How many full weeks before this week to include"),
-    start: date | None = Query(None, description="Override start date (YYYY-MM-DD)"),
-    end: date | None = Query(None, description="Override end date (YYYY-MM-DD)"),
-    klasse: str | None = Query(None, description="If set, fetch timetable for class name instead of logged-in user"),
-    token: str | None = Query(None, description="Access token; required if ACCESS_TOKEN is set"),
-):
-    """
-    Export the logged-in user's timetable as an ICS feed.
+def try_map(kind, fetcher):
+    try:
+        return cached_lookup(kind, lambda: {obj.id: getattr(obj, "longname", obj.name) for obj in fetcher()})
+    except Exception:
+        return {}
 
-    Args:
-        weeks: number of weeks to include from the current week into the future (default 3).
-        past_weeks: number of full weeks to include before the current week (default 0).
-        start/end: explicit date range overrides (bypass weeks/past_weeks).
-        klasse: class name (exact match from Untis) if you want class timetable instead of my_timetable.
-        token: optional access token; required when ACCESS_TOKEN env is set.
+
+def klassen_by_name(session):
     """
-    if ACCESS_TOKEN:
-        if not token or not hmac.compare_digest(token, ACCESS_TOKEN):
-            raise HTTPException(status_code=401, detail="Invalid or missing token")
-    if not start or not end:
-        today = date.today()
-        this_monday = today - timedelta(days=today.weekday())  # Monday of this week
-        start = this_monday - timedelta(days=7 * past_weeks)
-        end = this_monday + timedelta(days=7 * weeks)
+    Index klassen by name (exact, case-sensitive match as in Untis). The Klasse objects belong
+    to the session that fetched them, so the index is rebuilt whenever the session is recycled.
+    """
+    return cached_lookup("klassen", lambda: {k.name: k for k in session.klassen()})
+
 
+def try_my_timetable(session, start, end):
+    """
+    Personal timetable, or None if it could not be fetched (an empty list is a valid result).
+    """
     try:
-        with make_session() as session:
-            # Attempt to fetch the personal timetable regardless of klasse; if it works we can use it for filtering
-            my_periods = []
-            try:
-                my_periods = session.my_timetable(start=start, end=end)
-            except Exception:
-                my_periods = []
-
-            if klasse:
-                class_obj = next((k for k in session.klassen() if k.name == klasse), None)
-                if not class_obj:
-                    raise HTTPException(status_code=404, detail=f"Klasse '{klasse}' not found")
-                class_periods = session.timetable(klasse=class_obj, start=start, end=end)
-                if my_periods:
-                    my_ids = {p.id for p in my_periods}
-                    periods = [p for p in class_periods if p.id in my_ids]
-                else:
-                    periods = class_periods
+        return session.my_timetable(start=start, end=end)
+    except Exception:
+        return None
+
+
+def fetch_timetable(session, start, end, klasse):
+    """
+    Fetch periods plus the subject/teacher/room name maps needed to render them.
+    Periods are returned as (period, su_entries, te_entries, ro_entries) rows.
+    """
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        # Attempt to fetch the personal timetable regardless of klasse; if it works we can use it for filtering
+        f_my = pool.submit(try_my_timetable, session, start, end)
+        f_klassen = pool.submit(klassen_by_name, session) if klasse else None
+        f_sub = pool.submit(try_map, "subjects", session.subjects)
+        f_te = pool.submit(try_map, "teachers", session.teachers)
+        f_ro = pool.submit(try_map, "rooms", session.rooms)
+
+        if klasse:
+            class_obj = f_klassen.result().get(klasse)
+            if not class_obj:
+                raise HTTPException(status_code=404, detail=f"Klasse '{klasse}' not found")
+            class_periods = session.timetable(klasse=class_obj, start=start, end=end)
+            my_periods = f_my.result()
+            if my_periods:
+                is_mine = set(map(attrgetter("id"), my_periods)).__contains__
+                periods = [p for p in class_periods if is_mine(p.id)]
             else:
-                periods = my_periods or session.my_timetable(start=start, end=end)
-
-            def try_map(fetcher):
-                try:
-                    return {obj.id: getattr(obj, "longname", obj.name) for obj in fetcher()}
-                except Exception:
-                    return {}
-
-            subject_map = try_map(session.subjects)
-            teacher_map = {**HARDCODED_TEACHERS}
-            teacher_map.update(try_map(session.teachers))
-            room_map = try_map(session.rooms)
-
-            # If teacher_map is empty but we have teacher IDs, try a targeted fetch
-            teacher_ids_needed = {
-                item.get("id")
-                for p in periods
-                for item in getattr(p, "_data", {}).get("te", [])
-                if isinstance(item, dict) and item.get("id") is not None
-            }
-            if teacher_ids_needed and len(teacher_map) <= len(HARDCODED_TEACHERS):
-                try:
-                    filtered = session.teachers().filter(id=list(teacher_ids_needed))
-                    teacher_map.update({t.id: getattr(t, "longname", t.name) for t in filtered})
-                except Exception:
-                    pass
+                periods = class_periods
+        else:
+            my_periods = f_my.result()
+            # Only retry when the first fetch failed, so the error surfaces; an empty week is a valid answer
+            periods = my_periods if my_periods is not None else session.my_timetable(start=start, end=end)
+
+        subject_map, teacher_api, room_map = f_sub.result(), f_te.result(), f_ro.result()
+
+    teacher_map = {**HARDCODED_TEACHERS, **teacher_api}
+
+    # Single pass over the periods: extract su/te/ro entries for the event loop and collect teacher IDs
+    rows = []
+    teacher_ids_needed = set()
+    for period in periods:
+        pdata = getattr(period, "_data", {})
+        su_entries = pdata.get("su") or ()
+        te_entries = pdata.get("te") or ()
+        ro_entries = pdata.get("ro") or ()
+        try:
+            teacher_ids_needed.update([item.get("id") for item in te_entries])
+        except AttributeError:
+            warn_malformed(period)
+            te_entries = dict_entries(te_entries)
+            teacher_ids_needed.update(item.get("id") for item in te_entries)
+        rows.append((period, su_entries, te_entries, ro_entries))
+    teacher_ids_needed.discard(None)
+
+    # If teacher_map is empty but we have unresolved teacher IDs, try a targeted fetch
+    if teacher_ids_needed - teacher_map.keys() and len(teacher_map) <= len(HARDCODED_TEACHERS):
+        try:
+            filtered = session.teachers().filter(id=list(teacher_ids_needed))
+            teacher_map.update({t.id: getattr(t, "longname", t.name) for t in filtered})
+        except Exception:
+            pass
+
+    return rows, subject_map, teacher_map, room_map
+
+
+def _build_ics(start, end, klasse) -> bytes:
+    """
+    Fetch the timetable from WebUntis and serialize it as an iCalendar body.
+    """
+    try:
+        session = _get_session()
+        try:
+            rows, subject_map, teacher_map, room_map = fetch_timetable(session, start, end, klasse)
+        except webuntis.errors.Error:
+            # The pooled session may have expired server-side; log in again and retry once
+            _drop_session(session)
+            rows, subject_map, teacher_map, room_map = fetch_timetable(_get_session(), start, end, klasse)
     except HTTPException:
         raise
     except Exception as exc:
         raise HTTPException(status_code=502, detail=f"WebUntis error: {exc}")
 
-    tz = cached_timezone()
-    cal = Calendar()
-    cal.add("prodid", "-//Untis ICS Bridge//")
-    cal.add("version", "2.0")
-    cal.add("X-WR-CALNAME", "School Timetable")
-    cal.add("X-WR-TIMEZONE", tz.zone)
+    if not rows:
+        # Holidays/weekends: skip event building. Still an empty calendar rather than a 404,
+        # which Google Calendar would treat as an unreachable feed.
+        return ICS_HEADER + ICS_FOOTER
 
-    for period in periods:
-        event = Event()
-        event.add("uid", f"{period.id}@untis")
+    tz = TZ
+    # UTC times are written as ...Z; any other zone is referenced by TZID
+    if TZ_NAME in UTC_ZONES:
+        dtstart_name, dtend_name, dt_format = "DTSTART", "DTEND", "%Y%m%dT%H%M%SZ"
+    else:
+        dtstart_name, dtend_name, dt_format = f"DTSTART;TZID={TZ_NAME}", f"DTEND;TZID={TZ_NAME}", "%Y%m%dT%H%M%S"
+    buf = bytearray(ICS_HEADER)
 
+    for period, su_entries, te_entries, ro_entries in rows:
         # WebUntis Period objects expose .start and .end datetimes; use them directly
         start_dt = localize_dt(period.start, tz)
         end_dt = localize_dt(period.end, tz)
-        event.add("dtstart", start_dt)
-        event.add("dtend", end_dt)
 
-        pdata = getattr(period, "_data", {})
-        su_entries = [item for item in pdata.get("su", []) if isinstance(item, dict)]
-        te_entries = [item for item in pdata.get("te", []) if isinstance(item, dict)]
-        ro_entries = [item for item in pdata.get("ro", []) if isinstance(item, dict)]
-
-        def names_from_ids(entries, mapping, include_id=False):
-            names = []
-            for item in entries:
-                _id = item.get("id")
-                name = mapping.get(_id)
-                if not name:
-                    name = item.get("longname") or item.get("name")
-                label = name or str(_id)
-                if include_id and _id is not None:
-                    label = f"{label} ({_id})"
-                names.append(label)
-            return ", ".join(n for n in names if n)
-
-        subject_name = names_from_ids(su_entries, subject_map) or "Lesson"
-        teacher_names = names_from_ids(te_entries, teacher_map, include_id=True)
-        room_names = names_from_ids(ro_entries, room_map)
+        try:
+            subject_name, teacher_names, room_names, teacher_cancelled = period_labels(
+                su_entries, te_entries, ro_entries, subject_map, teacher_map, room_map
+            )
+        except AttributeError:
+            warn_malformed(period)
+            subject_name, teacher_names, room_names, teacher_cancelled = period_labels(
+                dict_entries(su_entries), dict_entries(te_entries), dict_entries(ro_entries),
+                subject_map, teacher_map, room_map,
+            )
 
         # Summary and location
-        title_parts = [subject_name]
-        if teacher_names:
-            title_parts.append(f"@ {teacher_names}")
-        event.add("summary", " ".join(title_parts))
-        event.add("location", room_names or "TBD")
+        summary = f"{subject_name} @ {teacher_names}" if teacher_names else subject_name
 
         # Description contains details shown in most calendar apps
-        event.add(
-            "description",
-            f"Subject: {subject_name}\nTeachers: {teacher_names or 'n/a'}\nRoom: {room_names or 'n/a'}",
-        )
-
-        teacher_ids = {item.get("id") for item in te_entries if isinstance(item, dict)}
-        teacher_cancelled = 0 in teacher_ids
+        description = f"Subject: {subject_name}\nTeachers: {teacher_names or 'n/a'}\nRoom: {room_names or 'n/a'}"
 
         is_cancelled = period_is_cancelled(period) or teacher_cancelled
 
         # Visual differentiation; keep STATUS confirmed so Google doesn't drop it from the feed
-        event.add("status", "CONFIRMED")
         if is_cancelled:
-            event.add("categories", ["Cancelled"])
-            event.add("X-GOOGLE-CALENDAR-COLOR", "#9e9e9e")  # grey
-            event["summary"] = f"[Cancelled] {event['summary']}"
+            summary = f"[Cancelled] {summary}"
+            category_line = b"CATEGORIES:Cancelled\r\n"
+            color_line = b"X-GOOGLE-CALENDAR-COLOR:#9e9e9e\r\n"  # grey
         else:
-            event.add("categories", ["Lesson"])
-            event.add("X-GOOGLE-CALENDAR-COLOR", "#1976d2")  # blue
+            category_line = b"CATEGORIES:Lesson\r\n"
+            color_line = b"X-GOOGLE-CALENDAR-COLOR:#1976d2\r\n"  # blue
+
+        buf += b"BEGIN:VEVENT\r\n"
+        ics_line(buf, "SUMMARY", escape_text(summary))
+        ics_line(buf, dtstart_name, start_dt.strftime(dt_format))
+        ics_line(buf, dtend_name, end_dt.strftime(dt_format))
+        ics_line(buf, "UID", f"{period.id}@untis")
+        buf += category_line
+        ics_line(buf, "DESCRIPTION", escape_text(description))
+        ics_line(buf, "LOCATION", escape_text(room_names or "TBD"))
+        buf += b"STATUS:CONFIRMED\r\n"
+        buf += color_line
+        buf += b"END:VEVENT\r\n"
+
+    buf += ICS_FOOTER
+    return bytes(buf)
+
+
+def _cached_ics(start, end, klasse):
+    """
+    Return (etag, body, timestamp, last_modified) for the range, rebuilding it at most once per CACHE_TTL.
+    last_modified is the wall-clock time the body last changed.
+    """
+    key = (start, end, klasse)
+    entry = _ics_cache.get(key)
+    if entry and time.monotonic() - entry[2] < CACHE_TTL:
+        return entry
+
+    with _ics_locks_guard:
+        lock = _ics_locks.setdefault(key, threading.Lock())
+    with lock:
+        try:
+            # Another request may have rebuilt it while we were waiting
+            entry = _ics_cache.get(key)
+            if entry and time.monotonic() - entry[2] < CACHE_TTL:
+                return entry
+
+            body = _build_ics(start, end, klasse)
+            etag = '"' + blake2b(body, digest_size=16).hexdigest() + '"'
+            last_modified = entry[3] if entry and entry[0] == etag else time.time()
+            entry = (etag, body, time.monotonic(), last_modified)
+            with _ics_locks_guard:
+                _ics_cache.pop(key, None)
+                _ics_cache[key] = entry
+                while len(_ics_cache) > ICS_CACHE_SIZE:
+                    oldest = next(iter(_ics_cache))
+                    del _ics_cache[oldest]
+                    _ics_locks.pop(oldest, None)
+            return entry
+        finally:
+            # Failed builds (unknown klasse, WebUntis errors) cache nothing; don't keep a lock for
+            # client-chosen keys that never make it into the cache
+            with _ics_locks_guard:
+                if key not in _ics_cache:
+                    _ics_locks.pop(key, None)
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Weak comparison of an If-None-Match header against our ETag (RFC 9110 13.1.2).
+    Proxies that compress the feed typically weaken the tag to W/"...".
+    """
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def not_modified_since(header, last_modified):
+    """
+    True if an If-Modified-Since header is at or after last_modified (HTTP dates have second precision).
+    """
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    return since.tzinfo is not None and since.timestamp() >= int(last_modified)
+
+
+@app.get("/calendar.ics")
+def calendar(
+    request: Request,
+    weeks: int = Query(3, ge=1, description="How many weeks to include starting this week"),
+    past_weeks: int = Query(0, ge=0, description="How many full weeks before this week to include"),
+    start: date | None = Query(None, description="Override start date (YYYY-MM-DD)"),
+    end: date | None = Query(None, description="Override end date (YYYY-MM-DD)"),
+    klasse: str | None = Query(None, description="If set, fetch timetable for class name instead of logged-in user"),
+    token: str | None = Query(None, description="Access token; required if ACCESS_TOKEN is set"),
+):
+    """
+    Export the logged-in user's timetable as an ICS feed.
+
+    Args:
+        weeks: number of weeks to include from the current week into the future (default 3).
+        past_weeks: number of full weeks to include before the current week (default 0).
+        start/end: explicit date range overrides (bypass weeks/past_weeks).
+        klasse: class name (exact match from Untis) if you want class timetable instead of my_timetable.
+        token: optional access token; required when ACCESS_TOKEN env is set.
+    """
+    if ACCESS_TOKEN_BYTES is not None:
+        # Compare bytes: compare_digest rejects non-ASCII str, and the expected token is encoded only once
+        token_bytes = (token or "").encode()
+        if len(token_bytes) != len(ACCESS_TOKEN_BYTES) or not hmac.compare_digest(token_bytes, ACCESS_TOKEN_BYTES):
+            raise HTTPException(status_code=401, detail="Invalid or missing token")
+    if not start or not end:
+        today = date.today()
+        this_monday = today - timedelta(days=today.weekday())  # Monday of this week
+        start = this_monday - timedelta(days=7 * past_weeks)
+        end = this_monday + timedelta(days=7 * weeks)
 
-        cal.add_component(event)
+    etag, body, _, last_modified = _cached_ics(start, end, klasse)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": f"public, max-age={CACHE_TTL}, stale-while-revalidate={STALE_WHILE_REVALIDATE}",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    elif not_modified_since(request.headers.get("if-modified-since"), last_modified):
+        return Response(status_code=304, headers=headers)
 
     # Google Calendar treats a 404 as an unreachable feed; return an empty calendar instead.
-    return Response(content=cal.to_ical(), media_type="text/calendar")
+    return Response(content=body, media_type="text/calendar", headers=headers)
+
+
+# Prebuilt so liveness probes skip FastAPI's JSON encoding (and, being async, the threadpool hop)
+HEALTH_RESPONSE = Response(content=b'{"ok":true}', media_type="application/json")
 
 
 @app.get("/health")
-def health():
-    return {"ok": True}
+async def health():
+    return HEALTH_RESPONSE
 
 
 if __name__ == "__main__":
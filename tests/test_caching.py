@@ -0,0 +1,32 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+
+ETAG = '"0123abcd"'
+
+
+class EtagMatchesTest(unittest.TestCase):
+    def test_exact(self):
+        self.assertTrue(main.etag_matches(ETAG, ETAG))
+
+    def test_weak(self):
+        self.assertTrue(main.etag_matches(f"W/{ETAG}", ETAG))
+
+    def test_list(self):
+        self.assertTrue(main.etag_matches(f'"other", {ETAG}', ETAG))
+        self.assertTrue(main.etag_matches(f'"other",W/{ETAG}', ETAG))
+
+    def test_wildcard(self):
+        self.assertTrue(main.etag_matches("*", ETAG))
+
+    def test_mismatch(self):
+        self.assertFalse(main.etag_matches('"other"', ETAG))
+        self.assertFalse(main.etag_matches("", ETAG))
+
+
+if __name__ == "__main__":
+    unittest.main()
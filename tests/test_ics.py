@@ -0,0 +1,91 @@
+import importlib
+import os
+import sys
+import unittest
+from datetime import date, datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+GOLDEN = Path(__file__).parent / "golden"
+
+
+class FakeObj:
+    def __init__(self, id, name, longname=None):
+        self.id = id
+        self.name = name
+        if longname:
+            self.longname = longname
+
+
+class FakePeriod:
+    def __init__(self, id, start, end, su=(), te=(), ro=(), code=""):
+        self.id = id
+        self.start = start
+        self.end = end
+        self.code = code
+        self._data = {
+            "su": [{"id": i} for i in su],
+            "te": [{"id": i} for i in te],
+            "ro": [{"id": i, "name": f"R{i}"} for i in ro],
+        }
+
+
+class FakeSession:
+    """Stands in for a logged-in webuntis.Session with fixed data."""
+
+    def my_timetable(self, start, end):
+        return [
+            FakePeriod(1, datetime(2026, 3, 27, 8), datetime(2026, 3, 27, 8, 50), su=[1], te=[32], ro=[5]),
+            # Europe/Vienna switches to summer time on 2026-03-29
+            FakePeriod(2, datetime(2026, 3, 30, 9), datetime(2026, 3, 30, 9, 50), su=[2], te=[41, 430], ro=[5, 7]),
+            FakePeriod(3, datetime(2026, 3, 30, 10), datetime(2026, 3, 30, 10, 50), su=[1], te=[0], code="cancelled"),
+            FakePeriod(
+                4,
+                datetime(2026, 3, 31, 7, 15, tzinfo=timezone.utc),
+                datetime(2026, 3, 31, 8, 5, tzinfo=timezone.utc),
+                su=[3],
+                te=[999],
+                ro=[9],
+            ),
+        ]
+
+    def subjects(self):
+        return [
+            FakeObj(1, "M", "Mathematik"),
+            FakeObj(2, "D", "Deutsch; Literatur, Grammatik"),
+            FakeObj(3, "BSP", "Bewegung und Sport für Fortgeschrittene mit überlangem Fachnamen"),
+        ]
+
+    def teachers(self):
+        raise RuntimeError("no rights")
+
+    def rooms(self):
+        return [FakeObj(5, "R5", "Raum 5"), FakeObj(9, "TS", "Turnsaal Ost\\West")]
+
+
+def build_feed(tz_name):
+    with mock.patch.dict(os.environ, {"TIMEZONE": tz_name, "ACCESS_TOKEN": ""}):
+        import main
+
+        main = importlib.reload(main)
+    with mock.patch.object(main, "_get_session", FakeSession):
+        return main._build_ics(date(2026, 3, 23), date(2026, 4, 6), None)
+
+
+class GoldenFeedTest(unittest.TestCase):
+    """The feed must match what the icalendar-based serializer produced for the same data."""
+
+    def assert_golden(self, tz_name, filename):
+        self.assertEqual(build_feed(tz_name), (GOLDEN / filename).read_bytes())
+
+    def test_utc(self):
+        self.assert_golden("UTC", "utc.ics")
+
+    def test_europe_vienna(self):
+        self.assert_golden("Europe/Vienna", "europe_vienna.ics")
+
+
+if __name__ == "__main__":
+    unittest.main()